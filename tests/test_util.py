@@ -6,8 +6,13 @@ from yubikit.management import FORM_FACTOR
 from ykman.util import is_pkcs12, is_pem, parse_private_key, parse_certificates
 from ykman.util import _parse_pkcs12
 from ykman.otp import format_oath_code, generate_static_pw, time_challenge
+from ykman._cli.util import pretty_print, prompt_timeout, YkmanContextObject
 from .util import open_file
 
+from threading import Event
+from unittest import mock
+
+import time
 import unittest
 
 
@@ -88,6 +93,35 @@ class TestUtilityFunctions(unittest.TestCase):
             b"\0\5hello\xfe\0\x12\x82\x01\x90" + b"hi" * 200, tlv1 + tlv2 + tlv3
         )
 
+    def test_pretty_print(self):
+        self.assertEqual(
+            [
+                "Info:      ",
+                "  name: value",
+                "  data: 0102",
+                "  nested:",
+                "    a:  1",
+                "    bb: 2",
+                "",
+                "  items:",
+                "    one",
+                "    two",
+                "",
+                "USB_A_NANO: 3",
+            ],
+            pretty_print(
+                {
+                    "Info": {
+                        "name": "value",
+                        "data": b"\x01\x02",
+                        "nested": {"a": 1, "bb": 2},
+                        "items": ["one", "two"],
+                    },
+                    FORM_FACTOR.USB_A_NANO: 3,
+                }
+            ),
+        )
+
     def test_is_pkcs12(self):
         with self.assertRaises(TypeError):
             is_pkcs12(None)
@@ -153,3 +187,108 @@ class TestUtilityFunctions(unittest.TestCase):
         self.assertEqual(FORM_FACTOR.USB_C_NANO, FORM_FACTOR.from_code(0x04))
         self.assertEqual(FORM_FACTOR.USB_C_LIGHTNING, FORM_FACTOR.from_code(0x05))
         self.assertEqual(FORM_FACTOR.UNKNOWN, FORM_FACTOR.from_code(0x99))
+
+
+class TestYkmanContextObject(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.obj = YkmanContextObject()
+        self.obj.add_resolver("a", lambda: self.calls.append("a") or 1)
+        self.obj.add_resolver("b", lambda: self.calls.append("b") or 2)
+
+    def test_lazy_per_key(self):
+        self.assertEqual(2, self.obj["b"])
+        self.assertEqual(["b"], self.calls)
+        self.assertEqual(2, self.obj["b"])
+        self.assertEqual(["b"], self.calls)
+        self.assertEqual(1, self.obj.get("a"))
+        self.assertEqual(["b", "a"], self.calls)
+
+    def test_iteration_includes_pending(self):
+        self.obj["c"] = 3
+        self.assertEqual(3, len(self.obj))
+        self.assertEqual({"a", "b", "c"}, set(self.obj))
+        self.assertEqual({"a", "b", "c"}, set(self.obj.keys()))
+        self.assertEqual([], self.calls)
+        self.assertEqual({"a": 1, "b": 2, "c": 3}, dict(self.obj))
+
+    def test_set_overrides_resolver(self):
+        self.obj.update(a="explicit")
+        self.assertEqual("explicit", self.obj["a"])
+        self.obj["b"] = "set"
+        self.assertEqual("set", self.obj["b"])
+        self.assertEqual([], self.calls)
+
+    def test_setdefault_resolves(self):
+        self.assertEqual(1, self.obj.setdefault("a", "x"))
+        self.assertEqual(1, self.obj["a"])
+        self.assertEqual("x", self.obj.setdefault("c", "x"))
+
+    def test_delete_pending(self):
+        del self.obj["a"]
+        self.assertNotIn("a", self.obj)
+        self.assertEqual(2, self.obj.pop("b"))
+        self.assertEqual(0, len(self.obj))
+        self.assertEqual(["b"], self.calls)
+        with self.assertRaises(KeyError):
+            del self.obj["a"]
+
+    def test_postponed_not_a_key(self):
+        def postponed():
+            self.obj["session"] = self.obj["a"] + 10
+
+        self.obj.add_postponed(postponed)
+        self.assertEqual(11, self.obj["session"])
+        self.assertEqual({"a", "b", "session"}, set(self.obj))
+
+    def test_postponed_run_first_in_order(self):
+        def group():
+            self.calls.append("group")
+            self.obj["session"] = self.obj["a"]
+
+        def subgroup():
+            self.calls.append("subgroup")
+            self.obj["sub"] = self.obj["session"] + 1
+
+        self.obj.add_postponed(group)
+        self.obj.add_postponed(subgroup)
+        self.assertEqual(2, self.obj["b"])
+        self.calls.append("confirm")
+        self.assertEqual(2, self.obj["sub"])
+        self.assertEqual(["group", "a", "subgroup", "b", "confirm"], self.calls)
+
+    def test_postponed_failure_on_first_access(self):
+        def group():
+            raise ValueError("Failed to parse access code")
+
+        self.obj.add_postponed(group)
+        with self.assertRaises(ValueError):
+            self.obj["a"]
+        self.assertEqual([], self.calls)
+
+
+@mock.patch("ykman._cli.util.prompt_for_touch")
+class TestPromptTimeout(unittest.TestCase):
+    def test_fires_after_timeout(self, prompt):
+        fired = Event()
+        prompt.side_effect = fired.set
+        with prompt_timeout(timeout=0.05):
+            self.assertTrue(fired.wait(2))
+        prompt.assert_called_once_with()
+
+    def test_cancelled_on_exit(self, prompt):
+        with prompt_timeout(timeout=0.2):
+            pass
+        time.sleep(0.4)
+        prompt.assert_not_called()
+
+    def test_fires_again_after_drained(self, prompt):
+        fired = Event()
+        prompt.side_effect = fired.set
+        with prompt_timeout(timeout=0.05):
+            self.assertTrue(fired.wait(2))
+        fired.clear()
+        time.sleep(0.1)
+        with prompt_timeout(timeout=0.05):
+            self.assertTrue(fired.wait(2))
+        self.assertEqual(2, prompt.call_count)
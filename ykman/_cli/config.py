@@ -55,6 +55,7 @@ logger = logging.getLogger(__name__)
 
 
 CLEAR_LOCK_CODE = b"\0" * 16
+ALL_CAPABILITIES = sum(CAPABILITY)
 
 
 def prompt_lock_code():
@@ -219,7 +220,7 @@ def _configure_applications(
     new_enabled = (enabled | enable) & ~disable
 
     if transport == TRANSPORT.USB:
-        if sum(CAPABILITY) & new_enabled == 0:
+        if ALL_CAPABILITIES & new_enabled == 0:
             ctx.fail(f"Can not disable all applications over {transport}.")
 
         reboot = enabled.usb_interfaces != new_enabled.usb_interfaces
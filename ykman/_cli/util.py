@@ -27,18 +27,19 @@
 
 import functools
 import click
+import sched
 import sys
-from yubikit.management import DeviceInfo
-from yubikit.oath import parse_b32_key
-from collections import OrderedDict
 from collections.abc import MutableMapping
-from cryptography.hazmat.primitives import serialization
 from contextlib import contextmanager
-from threading import Timer
+from threading import Event, Lock, Thread
 from enum import Enum
-from typing import List
+from typing import Dict, List, Tuple, TYPE_CHECKING
 import logging
 
+if TYPE_CHECKING:
+    from yubikit.management import DeviceInfo
+    from cryptography.hazmat.primitives import serialization
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,17 +65,24 @@ class _YkmanCommand(click.Command):
 class _YkmanGroup(_YkmanCommand, click.Group):
     command_class = _YkmanCommand
 
+    def __init__(self, *args, **kwargs):
+        self._sorted_commands = None
+        super().__init__(*args, **kwargs)
+
     def add_command(self, cmd, name=None):
         if not isinstance(cmd, (_YkmanGroup, _YkmanCommand)):
             raise ValueError(
                 f"Command {cmd} does not inherit from _YkmanGroup or _YkmanCommand"
             )
         super().add_command(cmd, name)
+        self._sorted_commands = None
 
     def list_commands(self, ctx):
-        return sorted(
-            self.commands, key=lambda c: (isinstance(self.commands[c], click.Group), c)
-        )
+        if self._sorted_commands is None:
+            keys = [(isinstance(c, click.Group), n) for n, c in self.commands.items()]
+            keys.sort()
+            self._sorted_commands = [n for _, n in keys]
+        return list(self._sorted_commands)
 
 
 _YkmanGroup.group_class = _YkmanGroup
@@ -98,6 +106,11 @@ def click_command(*args, connections=None, **kwargs):
     )
 
 
+@functools.lru_cache(maxsize=None)
+def _enum_choice_names(choices_enum, hidden):
+    return tuple(v.name.replace("_", "-") for v in choices_enum if v not in hidden)
+
+
 class EnumChoice(click.Choice):
     """
     Use an enum's member names as the definition for a choice option.
@@ -108,7 +121,7 @@ class EnumChoice(click.Choice):
 
     def __init__(self, choices_enum, hidden=[]):
         super().__init__(
-            [v.name.replace("_", "-") for v in choices_enum if v not in hidden],
+            _enum_choice_names(choices_enum, frozenset(hidden)),
             case_sensitive=False,
         )
         self.choices_enum = choices_enum
@@ -136,13 +149,20 @@ def click_callback(invoke_on_missing=False):
     return wrap
 
 
+_FORMAT_MAP: Dict[str, "serialization.Encoding"] = {}
+
+
 @click_callback()
 def click_parse_format(ctx, param, val):
-    if val == "PEM":
-        return serialization.Encoding.PEM
-    elif val == "DER":
-        return serialization.Encoding.DER
-    else:
+    if not _FORMAT_MAP:
+        from cryptography.hazmat.primitives import serialization
+
+        _FORMAT_MAP.update(
+            PEM=serialization.Encoding.PEM, DER=serialization.Encoding.DER
+        )
+    try:
+        return _FORMAT_MAP[val]
+    except KeyError:
         raise ValueError(val)
 
 
@@ -164,52 +184,68 @@ click_format_option = click.option(
 
 class YkmanContextObject(MutableMapping):
     def __init__(self):
-        self._objects = OrderedDict()
-        self._resolved = False
+        self._objects = {}
+        self._resolvers = {}
+        self._postponed = []
 
     def add_resolver(self, key, f):
-        if self._resolved:
-            f = f()
-        self._objects[key] = f
+        self._objects.pop(key, None)
+        self._resolvers[key] = f
+
+    def add_postponed(self, f):
+        self._postponed.append(f)
 
-    def resolve(self):
-        if not self._resolved:
-            self._resolved = True
-            for k, f in self._objects.copy().items():
-                self._objects[k] = f()
+    def _resolve(self, key):
+        self._objects[key] = self._resolvers.pop(key)()
 
     def __getitem__(self, key):
-        self.resolve()
+        if self._postponed:
+            # Postponed executions run, in order, before anything else is resolved
+            postponed, self._postponed = self._postponed, []
+            for f in postponed:
+                f()
+        if key in self._resolvers:
+            self._resolve(key)
         return self._objects[key]
 
     def __setitem__(self, key, value):
-        if not self._resolved:
-            raise ValueError("BUG: Attempted to set item when unresolved.")
+        self._resolvers.pop(key, None)
         self._objects[key] = value
 
     def __delitem__(self, key):
-        del self._objects[key]
+        if key in self._resolvers:
+            del self._resolvers[key]
+        else:
+            del self._objects[key]
 
     def __len__(self):
-        return len(self._objects)
+        return len(self._objects) + len(self._resolvers)
 
     def __iter__(self):
-        return iter(self._objects)
+        yield from list(self._objects)
+        yield from list(self._resolvers)
 
 
 def click_postpone_execution(f):
     @functools.wraps(f)
     def inner(*args, **kwargs):
-        click.get_current_context().obj.add_resolver(str(f), lambda: f(*args, **kwargs))
+        click.get_current_context().obj.add_postponed(lambda: f(*args, **kwargs))
 
     return inner
 
 
 @click_callback()
 def click_parse_b32_key(ctx, param, val):
+    from yubikit.oath import parse_b32_key
+
     return parse_b32_key(val)
 
 
+@functools.lru_cache(maxsize=1)
+def _is_tty(stream) -> bool:
+    return stream.isatty()
+
+
 def click_prompt(prompt, err=True, **kwargs):
     """Replacement for click.prompt to better work when piping input to the command.
 
@@ -217,7 +253,7 @@ def click_prompt(prompt, err=True, **kwargs):
     use it.
     """
     logger.debug(f"Input requested ({prompt})")
-    if not sys.stdin.isatty():  # Piped from stdin, see if there is data
+    if not _is_tty(sys.stdin):  # Piped from stdin, see if there is data
         logger.debug("TTY detected, reading line from stdin...")
         line = sys.stdin.readline()
         if line:
@@ -237,14 +273,44 @@ def prompt_for_touch():
         sys.stderr.write("Touch your YubiKey...\n")
 
 
+_scheduler = sched.scheduler()
+_scheduler_wakeup = Event()
+_scheduler_lock = Lock()
+_scheduler_thread = None
+
+
+def _run_scheduler():
+    while True:
+        _scheduler_wakeup.clear()
+        try:
+            delay = _scheduler.run(blocking=False)
+        except Exception:
+            logger.exception("Scheduled action failed")
+            continue
+        _scheduler_wakeup.wait(delay)
+
+
+def _schedule(delay, action):
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is None:
+            _scheduler_thread = Thread(target=_run_scheduler, daemon=True)
+            _scheduler_thread.start()
+    event = _scheduler.enter(delay, 0, action)
+    _scheduler_wakeup.set()
+    return event
+
+
 @contextmanager
 def prompt_timeout(timeout=0.5):
-    timer = Timer(timeout, prompt_for_touch)
+    event = _schedule(timeout, prompt_for_touch)
     try:
-        timer.start()
         yield None
     finally:
-        timer.cancel()
+        try:
+            _scheduler.cancel(event)
+        except ValueError:
+            pass  # Already fired
 
 
 class CliFail(Exception):
@@ -253,27 +319,45 @@ class CliFail(Exception):
         self.status = status
 
 
+_INDENTS = [""]
+
+
+def _indent(level: int) -> str:
+    while len(_INDENTS) <= level:
+        _INDENTS.append(_INDENTS[-1] + "  ")
+    return _INDENTS[level]
+
+
+# Keyed on (type, member) as IntFlag members of different types may compare equal
+_ENUM_LABELS: Dict[Tuple[type, Enum], str] = {}
+
+
+def _key_label(k) -> str:
+    if isinstance(k, Enum):
+        key = (type(k), k)
+        label = _ENUM_LABELS.get(key)
+        if label is None:
+            label = _ENUM_LABELS[key] = sys.intern(k.name or str(k))
+        return label
+    return sys.intern(k) if type(k) is str else k
+
+
 def pretty_print(value, level: int = 0) -> List[str]:
     """Pretty-prints structured data, as that returned by get_diagnostics.
 
     Returns a list of strings which can be printed as lines.
     """
-    indent = "  " * level
+    indent = _indent(level)
     lines = []
     if isinstance(value, list):
         for v in value:
             lines.extend(pretty_print(v, level))
     elif isinstance(value, dict):
         res = []
-        mlen = 0
         for k, v in value.items():
-            if isinstance(k, Enum):
-                k = k.name or str(k)
             p = pretty_print(v, level + 1)
-            ml = len(p) > 1 or isinstance(v, (list, dict))
-            if not ml:
-                mlen = max(mlen, len(k))
-            res.append((k, p, ml))
+            res.append((_key_label(k), p, len(p) > 1 or isinstance(v, (list, dict))))
+        mlen = max((len(k) for k, _, ml in res if not ml), default=0)
         mlen += len(indent) + 1
         for k, p, ml in res:
             k_line = f"{indent}{k}:".ljust(mlen)
@@ -291,5 +375,5 @@ def pretty_print(value, level: int = 0) -> List[str]:
     return lines
 
 
-def is_yk4_fips(info: DeviceInfo) -> bool:
+def is_yk4_fips(info: "DeviceInfo") -> bool:
     return info.version[0] == 4 and info.is_fips